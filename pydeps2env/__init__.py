@@ -6,12 +6,15 @@ from .generate_environment import (
     create_environment_file,
     create_from_definition,
 )
+from .registry import register_loader, register_transport
 
 __all__ = [
     "Environment",
     "create_environment",
     "create_environment_file",
     "create_from_definition",
+    "register_loader",
+    "register_transport",
 ]
 
 from importlib.metadata import PackageNotFoundError, version
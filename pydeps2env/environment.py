@@ -7,9 +7,14 @@ from packaging.requirements import Requirement
 from pathlib import Path
 from collections import defaultdict
 import configparser
+import os
 import sys
+import tempfile
 import yaml
+from contextlib import contextmanager
 from io import StringIO, BytesIO
+from collections.abc import Iterator, Mapping
+from typing import TextIO
 from warnings import warn
 
 if sys.version_info < (3, 11):
@@ -17,6 +22,11 @@ if sys.version_info < (3, 11):
 else:
     import tomllib
 
+try:
+    from pydeps2env.registry import get_loader, get_transport
+except ModuleNotFoundError:  # try local file if not installed
+    from registry import get_loader, get_transport
+
 
 def get_mapping():
     """Downloads the mapping conda->pypi names from Parselmouth and returns the reverse mapping."""
@@ -42,9 +52,33 @@ def get_mapping():
 
 # A pip requirement can contain dashes in their name, we need to replace them to underscores.
 # https://docs.conda.io/projects/conda-build/en/latest/concepts/package-naming-conv.html#term-Package-name
-"""This mapping holds name mappings from pypi to conda packages."""
-pypi_to_conda_mapping = get_mapping()
-conda_to_pypi_mapping = {v: k for k, v in pypi_to_conda_mapping.items() if v}
+"""The name mappings from pypi to conda packages and reverse (loaded on first use)."""
+_mappings: tuple[Mapping[str, str], Mapping[str, str]] | None = None
+_mappings_version = 0
+
+
+def get_mappings() -> tuple[Mapping[str, str], Mapping[str, str]]:
+    """Get the pypi->conda and conda->pypi name mappings, loading them on first use."""
+    if _mappings is None:
+        pypi_to_conda = get_mapping()
+        set_mappings(pypi_to_conda, {v: k for k, v in pypi_to_conda.items() if v})
+    return _mappings
+
+
+def set_mappings(pypi_to_conda: Mapping[str, str], conda_to_pypi: Mapping[str, str]):
+    """Replace the pypi->conda and conda->pypi name mappings."""
+    global _mappings, _mappings_version
+    _mappings = (pypi_to_conda, conda_to_pypi)
+    _mappings_version += 1
+
+
+def __getattr__(name: str):
+    # keep `pypi_to_conda_mapping` and `conda_to_pypi_mapping` available (lazily)
+    if name == "pypi_to_conda_mapping":
+        return get_mappings()[0]
+    if name == "conda_to_pypi_mapping":
+        return get_mappings()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def split_extras(filename: str) -> tuple[str, set]:
@@ -67,6 +101,52 @@ def _render_pip_str(
     return pip_str
 
 
+class RequirementDict(dict):
+    """Requirements by name that count their modifications (to invalidate caches).
+
+    Changes to the `Requirement` objects themselves are only tracked if they are
+    made through `add_requirement` (or by calling `touch`).
+    """
+
+    version: int = 0
+
+    def touch(self):
+        """Mark the requirements as modified."""
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.touch()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.touch()
+
+    def pop(self, *args):
+        self.touch()
+        return super().pop(*args)
+
+    def popitem(self):
+        self.touch()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.touch()
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.touch()
+
+
 def add_requirement(
     req: Requirement | str,
     requirements: dict[str, Requirement],
@@ -94,6 +174,9 @@ def add_requirement(
     else:
         raise ValueError(f"Unknown `mode` for add_requirement: {mode}")
 
+    if isinstance(requirements, RequirementDict):  # requirements modified in place
+        requirements.touch()
+
 
 def extract_url_user_auth(url) -> tuple[str, str, str]:
     """Extract basic url, user and authentication from url scheme.
@@ -122,6 +205,107 @@ def guess_suffix_from_url(url) -> str:
     return "." + url.split(".")[-1].split("/")[0]
 
 
+def guess_name_from_url(url) -> str:
+    """Try to extract the filename from url (last path segment with a suffix)."""
+    import re
+    import urllib.parse
+
+    segments = [
+        s for s in re.split(r"[/:]", urllib.parse.urlsplit(url).path or url) if s
+    ]
+    for segment in reversed(segments):
+        if Path(segment).suffix:
+            return segment
+    return segments[-1] if segments else ""
+
+
+def fetch_url(url: str) -> bytes:
+    """Download the raw contents of a file from a web url."""
+    import urllib.request
+
+    _token = None
+
+    # site specific url parsing
+    if "/github.com/" in url:
+        url = url.replace("/github.com/", "/raw.githubusercontent.com/")
+        url = url.replace("/blob/", "/")
+    elif "git.bam.de" in url or "gitlab.com" in url:
+        url, _, _token = extract_url_user_auth(url)
+
+    req = urllib.request.Request(url)
+    if _token:
+        req.add_header("PRIVATE-TOKEN", _token)
+
+    with urllib.request.urlopen(req) as f:
+        return f.read()  # read raw content into bytes
+
+
+_yaml_resolver = yaml.resolver.Resolver()
+
+
+def _yaml_events(
+    data, representer: yaml.representer.Representer
+) -> Iterator[yaml.Event]:
+    """Generate the yaml events of nested dicts, lists and scalars (block style)."""
+    if isinstance(data, dict):
+        yield yaml.MappingStartEvent(None, None, implicit=True, flow_style=False)
+        for key, value in data.items():
+            yield from _yaml_events(key, representer)
+            yield from _yaml_events(value, representer)
+        yield yaml.MappingEndEvent()
+    elif isinstance(data, list):
+        yield yaml.SequenceStartEvent(None, None, implicit=True, flow_style=False)
+        for value in data:
+            yield from _yaml_events(value, representer)
+        yield yaml.SequenceEndEvent()
+    else:
+        # represent scalars with their own tag and resolve implicit tags like yaml.dump
+        node = representer.represent_data(data)
+        detected = _yaml_resolver.resolve(yaml.ScalarNode, node.value, (True, False))
+        default = _yaml_resolver.resolve(yaml.ScalarNode, node.value, (False, True))
+        implicit = (node.tag == detected, node.tag == default)
+        yield yaml.ScalarEvent(
+            None, node.tag, implicit=implicit, value=node.value, style=node.style
+        )
+
+
+def _yaml_document_events(data) -> Iterator[yaml.Event]:
+    """Generate the yaml events to stream `data` as single document."""
+    yield yaml.StreamStartEvent()
+    yield yaml.DocumentStartEvent(explicit=False)
+    # representers keep track of the represented objects, use one per document
+    yield from _yaml_events(data, yaml.representer.Representer())
+    yield yaml.DocumentEndEvent(explicit=False)
+    yield yaml.StreamEndEvent()
+
+
+# the umask can only be read by changing it (process-wide), so read it once on import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def _atomic_open(filename: str | Path) -> Iterator[TextIO]:
+    """Open a temporary file for writing that replaces `filename` on success."""
+    # write through symlinks, replacing the target file
+    path = Path(os.path.realpath(filename))
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with open(fd, "w") as f:
+            yield f
+
+        # mkstemp creates private files, use the permissions of a regular new file
+        if path.exists():
+            mode = path.stat().st_mode & 0o777
+        else:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
 def combine_requirements(
     req1: dict[str, Requirement], req2: dict[str, Requirement]
 ) -> dict[str, Requirement]:
@@ -134,6 +318,19 @@ def combine_requirements(
     return req1
 
 
+@dataclass
+class _Rendering:
+    """Rendered requirement strings of an `Environment`, sorted and ready to filter.
+
+    Each entry holds the set of names that remove it and the rendered string.
+    """
+
+    python: str | None
+    conda: list[tuple[set[str], str]]
+    pip: list[tuple[set[str], str]]
+    txt: list[tuple[set[str], str]]
+
+
 @dataclass
 class Environment:
     filename: str | Path
@@ -147,8 +344,16 @@ class Environment:
     extra_requirements: InitVar[list[str]] = None
     """names of packages to install in pip editable mode"""
     editable: set[str] = field(default_factory=set)
-    requirements: dict[str, Requirement] = field(default_factory=dict, init=False)
-    build_system: dict[str, Requirement] = field(default_factory=dict, init=False)
+    requirements: dict[str, Requirement] = field(
+        default_factory=RequirementDict, init=False
+    )
+    build_system: dict[str, Requirement] = field(
+        default_factory=RequirementDict, init=False
+    )
+    _rendered: dict[tuple, _Rendering] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _rendered_state: tuple = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self, extra_requirements):
         # cleanup duplicates etc.
@@ -186,46 +391,25 @@ class Environment:
             self.filename, extras = split_extras(self.filename)
             self.extras |= set(extras)
 
-        # get file contents from web url or local file
-        if isinstance(self.filename, str) and self.filename.startswith("http"):
-            import urllib.request
-
-            url = self.filename
-            _token = None
-
-            # site specific url parsing
-            if "/github.com/" in url:
-                url = url.replace("/github.com/", "/raw.githubusercontent.com/")
-                url = url.replace("/blob/", "/")
-            elif "git.bam.de" in url or "gitlab.com" in url:
-                url, _, _token = extract_url_user_auth(url)
-
-            req = urllib.request.Request(url)
-            if _token:
-                req.add_header("PRIVATE-TOKEN", _token)
-
-            # store suffix for later parsing
-            self._suffix = guess_suffix_from_url(url)
-
-            with urllib.request.urlopen(req) as f:
-                _contents: bytes = f.read()  # read raw content into bytes
+        # get file contents from registered transport or local file
+        if transport := get_transport(self.filename):
+            name = guess_name_from_url(self.filename)
+            # the filename can also be part of the query (e.g. `?file=pyproject.toml`)
+            suffix = Path(name).suffix or guess_suffix_from_url(self.filename)
+            _contents: bytes = transport(self.filename)
         else:  # local file
-            # store suffix for later parsing
-            self._suffix = Path(self.filename).suffix
-
+            name = Path(self.filename).name
+            suffix = Path(name).suffix
             with open(self.filename, "rb") as f:
                 _contents: bytes = f.read()
 
-        if self._suffix == ".toml":
-            self.load_pyproject(_contents)
-        elif self._suffix == ".cfg":
-            self.load_config(_contents)
-        elif self._suffix in [".yaml", ".yml"]:
-            self.load_yaml(_contents)
-        elif self._suffix in [".txt"]:
-            self.load_txt(_contents)
-        else:
+        # store suffix for later parsing
+        self._suffix = suffix
+
+        loader = get_loader(name) or get_loader(suffix)
+        if loader is None:
             raise ValueError(f"Unsupported input {self.filename}")
+        loader(self, _contents)
 
     def load_pyproject(self, contents: bytes):
         """Load contents from a toml file (assume pyproject.toml layout)."""
@@ -268,13 +452,13 @@ class Environment:
 
         for dep in env.get("dependencies"):
             if isinstance(dep, str):
-                add_requirement(dep, self.requirements)
+                self.add_requirements([dep])
             elif isinstance(dep, dict) and "pip" in dep:
-                add_requirement("pip", self.requirements)
+                self.add_requirements(["pip"])
                 for pip_dep in dep["pip"]:
                     req = Requirement(pip_dep)
                     self.pip_packages |= {req.name}
-                    add_requirement(req, self.requirements)
+                    self.add_requirements([req])
 
     def load_txt(self, contents: bytes):
         """Load simple list of requirements from txt file."""
@@ -282,6 +466,73 @@ class Environment:
 
         self.add_requirements([dep.strip() for dep in deps])
 
+    def _render(self, include_build_system: bool = True) -> _Rendering:
+        """Get the converted and rendered requirements (cached until modified).
+
+        Modifications are tracked through the versions of the `RequirementDict`
+        instances and of the name mappings, requirements stored in plain dicts are
+        rendered on every call.
+        """
+        get_mappings()  # load the mappings before reading their version
+        state = (_mappings_version,) + tuple(
+            (id(reqs), reqs.version) if isinstance(reqs, RequirementDict) else None
+            for reqs in (self.requirements, self.build_system)
+        )
+        if state != self._rendered_state or None in state:
+            self._rendered.clear()
+            self._rendered_state = state
+
+        key = (
+            include_build_system,
+            frozenset(self.pip_packages),
+            frozenset(self.editable),
+        )
+        if key in self._rendered:
+            return self._rendered[key]
+
+        reqs = copy.deepcopy(self.requirements)
+        if include_build_system:
+            reqs = combine_requirements(reqs, self.build_system)
+
+        _python = reqs.pop("python", None)
+        _pip_packages = self.pip_packages
+        pypi_to_conda_mapping, conda_to_pypi_mapping = get_mappings()
+
+        conda, pip, txt = [], [], []
+        for k, r in reqs.items():
+            # conda environment entries
+            if not r.url and r.name not in _pip_packages:
+                dep = copy.copy(r)  # work on copies
+                if dep.name in pypi_to_conda_mapping:
+                    dep.name = pypi_to_conda_mapping[dep.name]
+                    dep.extras = {}  # cannot handle extras in conda
+                dep.marker = None  # conda doesn't support markers
+                conda.append(({r.name}, str(dep)))
+            else:  # install via pip
+                dep = copy.copy(r)
+                if k not in _pip_packages:  # no need to convert
+                    dep.name = pypi_to_conda_mapping.get(dep.name, dep.name)
+                pip_str = _render_pip_str(dep, editable=dep.name in self.editable)
+                pip.append(({r.name, dep.name}, pip_str))
+
+            # requirements.txt entries
+            dep = copy.copy(r)
+            dep.name = conda_to_pypi_mapping.get(dep.name, dep.name)
+            txt.append(({k, dep.name}, str(dep)))
+
+        for entries in (conda, pip, txt):
+            entries.sort(key=lambda entry: entry[1].lower())
+
+        rendering = _Rendering(
+            python=str(_python) if _python else None,
+            conda=conda,
+            pip=pip,
+            txt=txt,
+        )
+        if None not in state:
+            self._rendered[key] = rendering
+        return rendering
+
     def _get_conda_dependencies(
         self,
         include_build_system: bool = True,
@@ -289,62 +540,14 @@ class Environment:
     ) -> tuple[list[str], list[str]]:
         """Get the default conda environment entries."""
 
-        if remove is None:
-            remove = []
-
-        reqs = copy.deepcopy(self.requirements)
-        if include_build_system:
-            reqs = combine_requirements(reqs, self.build_system)
+        remove = set(remove) if remove else set()
+        rendering = self._render(include_build_system=include_build_system)
 
-        _python = reqs.pop("python", None)
+        deps = [dep for names, dep in rendering.conda if not names & remove]
+        if rendering.python:
+            deps = [rendering.python] + deps
 
-        _pip_packages = self.pip_packages
-        # _pip_packages |= {r.name for r in reqs.values() if r.url}
-
-        conda_reqs = {
-            k: r
-            for k, r in reqs.items()
-            if not r.url  # install via pip
-            and r.name not in _pip_packages
-            and r.name not in remove
-        }
-
-        for req_key in conda_reqs.keys():
-            if conda_reqs[req_key].name in pypi_to_conda_mapping.keys():
-                conda_reqs[req_key].name = pypi_to_conda_mapping[
-                    conda_reqs[req_key].name
-                ]
-                conda_reqs[req_key].extras = {}  # cannot handle extras in conda
-
-        deps = [copy.copy(r) for r in conda_reqs.values()]  # work on copies
-        for dep in deps:
-            dep.marker = None  # conda doesn't support markers
-        deps = [str(r) for r in deps]
-        deps.sort(key=str.lower)
-        if _python:
-            deps = [str(_python)] + deps
-
-        pip_reqs = {
-            k: r
-            for k, r in reqs.items()
-            if (r.name in _pip_packages or r.url) and r.name not in remove
-        }
-
-        for req_key in pip_reqs.keys():
-            if req_key in _pip_packages:  # no need to convert
-                continue
-            if pip_reqs[req_key].name in pypi_to_conda_mapping.keys():
-                pip_reqs[req_key].name = pypi_to_conda_mapping[pip_reqs[req_key].name]
-
-        pip = [
-            r
-            for r in pip_reqs.values()
-            if (r.name in _pip_packages or r.url) and r.name not in remove
-        ]
-
-        # string formatting
-        pip = [_render_pip_str(r, editable=r.name in self.editable) for r in pip]
-        pip.sort(key=str.lower)
+        pip = [dep for names, dep in rendering.pip if not names & remove]
 
         return deps, pip
 
@@ -357,82 +560,90 @@ class Environment:
 
         This function should produce dependencies suitable for requirements.txt.
         """
-        if remove is None:
-            remove = []
-
-        pip_reqs = copy.deepcopy(self.requirements)
-        if include_build_system:
-            pip_reqs = combine_requirements(pip_reqs, self.build_system)
-
-        _python = pip_reqs.pop("python", None)
-
-        for req_key in pip_reqs.keys():
-            if pip_reqs[req_key].name in conda_to_pypi_mapping.keys():
-                pip_reqs[req_key].name = conda_to_pypi_mapping[pip_reqs[req_key].name]
+        remove = set(remove) if remove else set()
+        rendering = self._render(include_build_system=include_build_system)
 
-        deps = [
-            str(r)
-            for k, r in pip_reqs.items()
-            if (r.name not in remove) and (k not in remove)
-        ]
-
-        deps.sort(key=str.lower)
-        if _python:
-            deps = [str(_python)] + deps
+        deps = [dep for names, dep in rendering.txt if not names & remove]
+        if rendering.python:
+            deps = [rendering.python] + deps
 
         return deps
 
     def export(
         self,
-        outfile: str | Path = "environment.yaml",
+        outfile: str | Path | TextIO = "environment.yaml",
         include_build_system: bool = True,
         remove: list[str] = None,
         name: str = None,
     ) -> None:
-        """Export the environment to a yaml or txt file."""
+        """Export the environment to a yaml or txt file.
+
+        The entries are written incrementally to `outfile`, which can be a filename,
+        an open text stream or ``"-"`` to write to stdout. Files are replaced
+        atomically once the export is complete. If `outfile` is ``None``, the conda
+        environment is returned as dictionary.
+        """
         if remove is None:
             remove = []
 
-        if outfile is not None:
-            p = Path(outfile)
+        if outfile is None:
+            stream, suffix = None, ".yaml"
+        elif outfile == "-":
+            stream, suffix = sys.stdout, ""
+        elif hasattr(outfile, "write"):
+            stream, suffix = outfile, Path(str(getattr(outfile, "name", ""))).suffix
         else:
-            p = None
+            stream, suffix = None, Path(outfile).suffix
 
-        if p and p.suffix in [".txt"]:
+        if suffix in [".txt"]:
             deps = self._get_pip_dependencies(
                 include_build_system=include_build_system, remove=remove
             )
-            with p.open("w") as outfile:
-                outfile.writelines("\n".join(deps))
-            return None
-        elif p and p.suffix not in [".yaml", ".yml"]:
-            msg = f"Unknown environment format `{p.suffix}`, generating conda yaml output."
-            warn(msg, stacklevel=2)
-
-        deps, pip = self._get_conda_dependencies(
-            include_build_system=include_build_system, remove=remove
-        )
 
-        conda_env = {
-            "name": name,
-            "channels": self.channels,
-            "dependencies": copy.deepcopy(deps),
-        }
-        if pip:
-            if "pip" not in self.requirements:
-                conda_env["dependencies"] += ["pip"]
-            conda_env["dependencies"] += [{"pip": pip}]
+            def _write(f: TextIO):
+                for i, dep in enumerate(deps):
+                    f.write(f"\n{dep}" if i else dep)
+
+        else:
+            if suffix not in [".yaml", ".yml"] and (stream is None or suffix):
+                msg = f"Unknown environment format `{suffix}`, generating conda yaml output."
+                warn(msg, stacklevel=2)
+
+            deps, pip = self._get_conda_dependencies(
+                include_build_system=include_build_system, remove=remove
+            )
+
+            conda_env = {
+                "name": name,
+                "channels": self.channels,
+                "dependencies": deps,
+            }
+            if pip:
+                if "pip" not in self.requirements:
+                    conda_env["dependencies"] += ["pip"]
+                conda_env["dependencies"] += [{"pip": pip}]
+
+            conda_env = {k: v for k, v in conda_env.items() if v}
 
-        conda_env = {k: v for k, v in conda_env.items() if v}
+            if outfile is None:
+                return conda_env
 
-        if p is None:
-            return conda_env
+            def _write(f: TextIO):
+                yaml.emit(_yaml_document_events(conda_env), f)
 
-        with open(p, "w") as outfile:
-            yaml.dump(conda_env, outfile, default_flow_style=False, sort_keys=False)
+        if stream is not None:
+            _write(stream)
+        else:
+            with _atomic_open(outfile) as f:
+                _write(f)
 
     def combine(self, other: Environment):
         """Merge other Environment requirements into this Environment."""
-        self.requirements = combine_requirements(self.requirements, other.requirements)
-        self.build_system = combine_requirements(self.build_system, other.build_system)
+        self.requirements = RequirementDict(
+            combine_requirements(self.requirements, other.requirements)
+        )
+        self.build_system = RequirementDict(
+            combine_requirements(self.build_system, other.build_system)
+        )
         self.pip_packages = self.pip_packages | other.pip_packages
+        self._rendered.clear()
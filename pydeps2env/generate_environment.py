@@ -1,13 +1,31 @@
 from __future__ import annotations
 
+import os
+import sys
+from io import StringIO
+from multiprocessing.context import BaseContext
 from pathlib import Path
 
 import yaml
 
 try:
-    from pydeps2env.environment import Environment, split_extras
+    from pydeps2env.environment import (
+        Environment,
+        get_mappings,
+        set_mappings,
+        split_extras,
+    )
+    from pydeps2env.registry import get_transport, prefetch_sources
+    from pydeps2env.shared_mapping import attach_mappings, share_mappings
 except ModuleNotFoundError:  # try local file if not installed
-    from environment import Environment, split_extras
+    from environment import (
+        Environment,
+        get_mappings,
+        set_mappings,
+        split_extras,
+    )
+    from registry import get_transport, prefetch_sources
+    from shared_mapping import attach_mappings, share_mappings
 
 
 def create_environment_file(
@@ -30,7 +48,7 @@ def create_environment_file(
     sources
         The list of source files to combine.
     output
-        The output filename to generate
+        The output filename to generate, an open text stream or ``"-"`` for stdout.
     channels
         Conda channels to include.
     extras
@@ -72,18 +90,82 @@ def create_environment_file(
     env.export(output, include_build_system=_include, remove=remove, name=name)
 
 
-def create_from_definition(env_def: str):
-    """Create an environment from parameters stored in a definition YAML file.
+def _load_definitions(env_def: str | Path) -> list[dict]:
+    """Load the configurations from a definition file (single mapping or list)."""
+    with open(env_def, "r") as f:
+        config = yaml.load(f.read(), yaml.SafeLoader)
+    return config if isinstance(config, list) else [config]
+
+
+def _create_from_config(config: dict) -> str | None:
+    """Create an environment file from a configuration.
+
+    Output to stdout is returned as string instead, so it can be written in order.
+    """
+    if config.get("output") == "-":
+        buffer = StringIO()
+        create_environment_file(**{**config, "output": buffer})
+        return buffer.getvalue()
+
+    create_environment_file(**config)
+    return None
+
+
+def _init_worker(shared_mapping: str):
+    """Use the name mappings shared by the parent process in a worker process."""
+    set_mappings(*attach_mappings(shared_mapping))
+
+
+def create_from_definition(
+    env_def: str | Path | list[str | Path],
+    *,
+    jobs: int = 1,
+    mp_context: BaseContext | None = None,
+):
+    """Create environments from parameters stored in definition YAML files.
 
     Parameters
     ----------
     env_def
-        The definition file.
+        The definition file or a list of definition files. Each file can hold a
+        single definition or a list of definitions.
+    jobs
+        Number of worker processes to create the environments in parallel.
+        Use ``0`` to use all available cores.
+    mp_context
+        The multiprocessing context used to start the worker processes
+        (defaults to the platform default).
 
     """
-    with open(env_def, "r") as f:
-        config = yaml.load(f.read(), yaml.SafeLoader)
-    create_environment_file(**config)
+    if isinstance(env_def, (str, Path)):
+        env_def = [env_def]
+    configs = [config for fn in env_def for config in _load_definitions(fn)]
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(configs))
+
+    if jobs <= 1:
+        for result in map(_create_from_config, configs):
+            if result is not None:
+                sys.stdout.write(result)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # workers attach to the parsed mappings instead of loading them again
+    with share_mappings(*get_mappings()) as shared_mapping:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(shared_mapping,),
+        )
+        with executor:
+            # results are collected in the order of the definitions
+            for result in executor.map(_create_from_config, configs):
+                if result is not None:
+                    sys.stdout.write(result)
 
 
 def create_environment(
@@ -128,6 +210,9 @@ def create_environment(
     if editable is None:
         editable = {}
 
+    # read remote sources in batches where supported by the transport
+    prefetch_sources([split_extras(source)[0] for source in sources])
+
     env = Environment(
         sources[0],
         pip_packages=pip,
@@ -157,7 +242,24 @@ def main():
         help="dependency files and sources",
     )
     parser.add_argument(
-        "-o", "--output", type=str, default="environment.yml", help="output file"
+        "-d",
+        "--definition",
+        type=str,
+        nargs="+",
+        help="definition files to create environments from (ignores other options)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="number of processes for definition files (0 uses all cores)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="environment.yml",
+        help="output file (use '-' to write to stdout)",
     )
     parser.add_argument(
         "-c", "--channels", type=str, nargs="*", default=["conda-forge"]
@@ -177,9 +279,17 @@ def main():
     )
     args = parser.parse_args()
 
+    if args.jobs is not None and not args.definition:
+        parser.error("argument -j/--jobs: only supported with -d/--definition")
+
+    if args.definition:
+        jobs = 1 if args.jobs is None else args.jobs
+        create_from_definition(args.definition, jobs=jobs)
+        return
+
     for file in args.sources:
         filename, _ = split_extras(file)
-        if not Path(filename).is_file():
+        if get_transport(filename) is None and not Path(filename).is_file():
             raise FileNotFoundError(f"Could not find file {filename}")
 
     create_environment_file(
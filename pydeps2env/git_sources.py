@@ -0,0 +1,106 @@
+"""Read source files from the object store of a local git repository.
+
+Sources are specified as ``git+file://<repository>@<ref>:<path>``, e.g.
+``git+file:///home/user/project@v1.0.0:pyproject.toml`` or
+``git+file://.@release/1.x:pyproject.toml`` for the repository in the current
+working directory. The file is read at the given ref (like ``git show <ref>:<path>``)
+without network access or checking out a worktree.
+
+The repository is separated from the ref at the first ``@``, so refs and paths may
+contain ``@`` (e.g. ``HEAD@{1}``). An ``@`` in the repository location has to be
+escaped as ``%40``.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+from collections import defaultdict
+from urllib.parse import unquote
+
+GIT_PREFIX = "git+file://"
+
+
+def parse_git_url(url: str) -> tuple[str, str, str]:
+    """Split a ``git+file://`` url into repository, ref and path.
+
+    Returns
+    -------
+    tuple
+        Tuple consisting of the repository location, the git ref and the file path
+        inside the repository.
+    """
+    if not url.startswith(GIT_PREFIX):
+        raise ValueError(f"Not a git source url: {url}")
+
+    repo, sep, revision = url[len(GIT_PREFIX) :].partition("@")
+    ref, _, path = revision.partition(":")
+    repo, ref, path = unquote(repo), unquote(ref), unquote(path)
+    if not (sep and repo and ref and path):
+        raise ValueError(
+            f"Invalid git source url `{url}`, expected `{GIT_PREFIX}<repo>@<ref>:<path>`"
+        )
+
+    if re.match(r"^/[A-Za-z]:", repo):  # windows drive letter (file:///C:/...)
+        repo = repo[1:]
+
+    return repo, ref, path
+
+
+def read_git_objects(repo: str, objects: list[str]) -> list[bytes]:
+    """Read the contents of multiple ``<ref>:<path>`` objects with a single git call."""
+    result = subprocess.run(
+        ["git", "-C", repo, "cat-file", "--batch"],
+        input="".join(f"{obj}\n" for obj in objects).encode(),
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode:
+        error = result.stderr.decode(errors="replace").strip()
+        if not os.path.isdir(repo):
+            raise FileNotFoundError(f"Could not find git repository {repo}: {error}")
+        raise ValueError(f"Could not read from git repository {repo}: {error}")
+
+    out = result.stdout
+    contents = []
+    pos = 0
+    for obj in objects:
+        end = out.index(b"\n", pos)
+        header = out[pos:end].decode().split()
+        pos = end + 1
+        if header[-1] in ["missing", "ambiguous"]:
+            raise FileNotFoundError(f"Could not find `{obj}` in git repository {repo}")
+        if header[1] != "blob":
+            raise ValueError(f"`{obj}` in git repository {repo} is not a file")
+        size = int(header[2])
+        contents.append(out[pos : pos + size])
+        pos += size + 1  # contents are terminated by a newline
+
+    return contents
+
+
+class GitTransport:
+    """Transport for ``git+file://`` sources with support for batched reads."""
+
+    def __init__(self):
+        self._cache: dict[str, bytes] = {}
+
+    def prefetch(self, urls: list[str]):
+        """Read all urls with a single git call per repository."""
+        objects = defaultdict(dict)
+        for url in dict.fromkeys(urls):
+            repo, ref, path = parse_git_url(url)
+            objects[repo][url] = f"{ref}:{path}"
+
+        for repo, repo_objects in objects.items():
+            contents = read_git_objects(repo, list(repo_objects.values()))
+            self._cache.update(zip(repo_objects.keys(), contents))
+
+    def __call__(self, url: str) -> bytes:
+        if url not in self._cache:
+            self.prefetch([url])
+        return self._cache.pop(url)
+
+
+fetch_git = GitTransport()
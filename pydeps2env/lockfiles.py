@@ -0,0 +1,354 @@
+"""Native loaders for python lockfile formats.
+
+All loaders add the locked (pinned) versions of the resolved packages to the
+`Environment`. This module is only imported when a matching lockfile is read.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+from collections import deque
+from io import BytesIO
+from typing import TYPE_CHECKING
+from warnings import warn
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+if sys.version_info < (3, 11):
+    import tomli as tomllib
+else:
+    import tomllib
+
+if TYPE_CHECKING:
+    from pydeps2env.environment import Environment
+
+
+def _python_requirement(spec: str) -> list[str]:
+    """Convert a python version specification into a requirement (if valid)."""
+    try:
+        return [str(Requirement("python" + spec))]
+    except InvalidRequirement:
+        warn(
+            f"Cannot convert python version specification `{spec}`, skipping.",
+            UserWarning,
+            stacklevel=3,
+        )
+        return []
+
+
+def _and_markers(a: str | None, b: str | None) -> str | None:
+    """Combine two (optional) environment markers."""
+    if not a or not b:
+        return a or b
+    return f"({a}) and ({b})"
+
+
+def load_pipfile_lock(env: Environment, contents: bytes):
+    """Load a pipenv ``Pipfile.lock`` file.
+
+    The ``develop`` packages are included with the ``dev`` or ``develop`` extras.
+    """
+    lock = json.loads(contents.decode("UTF-8"))
+
+    requires = lock.get("_meta", {}).get("requires", {})
+    if python := requires.get("python_full_version"):
+        env.add_requirements(_python_requirement("==" + python))
+    elif python := requires.get("python_version"):
+        env.add_requirements(_python_requirement("==" + python + ".*"))
+
+    sections = ["default"]
+    if env.extras & {"dev", "develop"}:
+        sections.append("develop")
+
+    reqs = []
+    for section in sections:
+        for name, spec in lock.get(section, {}).items():
+            if "path" in spec:
+                continue  # local packages
+            elif "git" in spec:
+                req = f"{name} @ git+{spec['git']}"
+                if ref := spec.get("ref"):
+                    req += f"@{ref}"
+            elif "file" in spec:
+                req = f"{name} @ {spec['file']}"
+            else:
+                req = name
+                if extras := spec.get("extras"):
+                    req += f"[{','.join(extras)}]"
+                req += spec.get("version", "")
+            if markers := spec.get("markers"):
+                req += f"; {markers}"
+            reqs.append(req)
+
+    env.add_requirements(reqs)
+
+
+def _poetry_bound(op: str, version: str) -> str:
+    """Translate a poetry caret (``^``) or tilde (``~``) constraint to PEP 440."""
+    parts = [int(p) for p in version.split(".")]
+    if op == "^":  # bump the first non-zero component
+        index = next((i for i, p in enumerate(parts) if p), len(parts) - 1)
+    else:  # bump the minor version if given
+        index = min(len(parts) - 1, 1)
+    upper = parts[:index] + [parts[index] + 1]
+    return f">={version},<{'.'.join(map(str, upper))}"
+
+
+_POETRY_CONSTRAINT = re.compile(r"(\^|~=|~|===|==|!=|<=|>=|<|>|=)?\s*(\*|\d[\w.*+!-]*)")
+
+
+def _poetry_constraint(spec: str) -> str | None:
+    """Convert a poetry version constraint to a PEP 440 specifier (if possible)."""
+    if "||" in spec or _POETRY_CONSTRAINT.sub("", spec).strip(" ,"):
+        return None
+
+    constraints = []
+    for op, version in _POETRY_CONSTRAINT.findall(spec):
+        if op in ["^", "~"]:
+            try:
+                constraints.append(_poetry_bound(op, version))
+            except ValueError:
+                return None
+        elif version != "*":
+            constraints.append(("==" if op in ["", "="] else op) + version)
+    return ",".join(constraints)
+
+
+_MARKER_TOKEN = re.compile(
+    r"""\s*(\(|\)|'[^']*'|"[^"]*"|===|==|!=|<=|>=|~=|<|>|not\s+in\b|[\w.]+)"""
+)
+
+
+def _strip_extra_markers(markers: str) -> str | None:
+    """Remove the ``extra == ...`` clauses from an environment marker.
+
+    The extras are resolved by the loader, so the clauses are treated as satisfied.
+    Returns ``None`` if the marker is always satisfied.
+    """
+    tokens = _MARKER_TOKEN.findall(markers)
+    pos = 0
+
+    def _or() -> tuple[str | None, bool]:
+        nonlocal pos
+        parts = [_and()]
+        while pos < len(tokens) and tokens[pos] == "or":
+            pos += 1
+            parts.append(_and())
+        if any(m is None for m, _ in parts):
+            return None, False
+        if len(parts) == 1:
+            return parts[0]
+        return " or ".join(m for m, _ in parts), True
+
+    def _and() -> tuple[str | None, bool]:
+        nonlocal pos
+        parts = [_atom()]
+        while pos < len(tokens) and tokens[pos] == "and":
+            pos += 1
+            parts.append(_atom())
+        parts = [(m, is_or) for m, is_or in parts if m is not None]
+        if len(parts) <= 1:
+            return parts[0] if parts else (None, False)
+        return " and ".join(f"({m})" if is_or else m for m, is_or in parts), False
+
+    def _atom() -> tuple[str | None, bool]:
+        nonlocal pos
+        if tokens[pos] == "(":
+            pos += 1
+            result = _or()
+            pos += 1  # closing parenthesis
+            return result
+        lhs, op, rhs = tokens[pos : pos + 3]
+        pos += 3
+        if "extra" in [lhs, rhs]:
+            return None, False
+        return f"{lhs} {' '.join(op.split())} {rhs}", False
+
+    return _or()[0]
+
+
+def _poetry_markers(pkg: dict, groups: set[str]) -> str | None:
+    """Get the environment markers of a poetry package for the selected groups."""
+    markers = pkg.get("markers")
+    if isinstance(markers, dict):  # lock 2.1 markers per group
+        selected = [markers.get(g) for g in groups]
+        if not selected or None in selected:
+            return None
+        markers = " or ".join(f"({m})" for m in dict.fromkeys(selected))
+    if not markers:
+        return None
+    return _strip_extra_markers(markers)
+
+
+def _poetry_name(requirement: str) -> str:
+    """Get the normalized package name of a poetry requirement (e.g. ``idna (>=2.5)``)."""
+    return canonicalize_name(re.split(r"[\s(\[;<>=!~]", requirement.strip(), 1)[0])
+
+
+def _poetry_optional(lock: dict, extras: set[str]) -> set[str]:
+    """Get the names of all packages required by the selected extras.
+
+    The dependencies of the packages listed under ``[extras]`` are collected
+    recursively, as they are marked as optional as well.
+    """
+    packages: dict[str, list[dict]] = {}
+    for pkg in lock.get("package", []):
+        packages.setdefault(canonicalize_name(pkg["name"]), []).append(pkg)
+
+    queue = deque(
+        (_poetry_name(req), frozenset())
+        for e in extras
+        for req in lock.get("extras", {}).get(e, [])
+    )
+    visited = set()
+    while queue:
+        name, pkg_extras = queue.popleft()
+        if (name, pkg_extras) in visited:
+            continue
+        visited.add((name, pkg_extras))
+
+        for pkg in packages.get(name, []):
+            requested = {
+                _poetry_name(req)
+                for e in pkg_extras
+                for req in pkg.get("extras", {}).get(e, [])
+            }
+            for dep_name, deps in pkg.get("dependencies", {}).items():
+                dep_name = canonicalize_name(dep_name)
+                for dep in deps if isinstance(deps, list) else [deps]:
+                    dep = dep if isinstance(dep, dict) else {}
+                    if dep.get("optional") and dep_name not in requested:
+                        continue
+                    queue.append((dep_name, frozenset(dep.get("extras", []))))
+
+    return {name for name, _ in visited}
+
+
+def load_poetry_lock(env: Environment, contents: bytes):
+    """Load a poetry ``poetry.lock`` file.
+
+    Packages of the ``main`` group are always included, packages of other dependency
+    groups (e.g. ``dev``) only if the group is selected as extra. Optional packages are
+    only included if they belong to one of the selected extras.
+    """
+    lock = tomllib.load(BytesIO(contents))
+
+    if python := lock.get("metadata", {}).get("python-versions"):
+        spec = _poetry_constraint(python)
+        if spec is None:
+            warn(
+                f"Cannot convert poetry python constraint `{python}`, skipping.",
+                UserWarning,
+                stacklevel=2,
+            )
+        elif spec:
+            env.add_requirements(_python_requirement(spec))
+
+    optional = _poetry_optional(lock, env.extras)
+
+    reqs = []
+    for pkg in lock.get("package", []):
+        # lock 2.1 uses dependency groups, lock 1.x a single category
+        groups = set(pkg.get("groups", [pkg.get("category", "main")]))
+        groups &= {"main"} | env.extras
+        if not groups:
+            continue
+        if pkg.get("optional") and canonicalize_name(pkg["name"]) not in optional:
+            continue
+        source = pkg.get("source", {})
+        if source.get("type") == "git":
+            ref = source.get("resolved_reference") or source.get("reference")
+            req = f"{pkg['name']} @ git+{source['url']}@{ref}"
+        elif source.get("type") in ["directory", "file"]:
+            continue  # local packages
+        else:
+            req = f"{pkg['name']}=={pkg['version']}"
+        if markers := _poetry_markers(pkg, groups):
+            req += f"; {markers}"
+        reqs.append(req)
+
+    env.add_requirements(reqs)
+
+
+def load_uv_lock(env: Environment, contents: bytes):
+    """Load a uv ``uv.lock`` file.
+
+    Starting from the project root package, all (transitive) dependencies of the
+    selected extras and development groups (e.g. ``dev``) are included.
+    """
+    lock = tomllib.load(BytesIO(contents))
+
+    if python := lock.get("requires-python"):
+        env.add_requirements(_python_requirement(python))
+
+    packages: dict[str, list[dict]] = {}
+    for pkg in lock.get("package", []):
+        packages.setdefault(pkg["name"], []).append(pkg)
+
+    def _is_local(pkg: dict) -> bool:
+        sources = {"editable", "virtual", "directory", "path"}
+        return bool(sources & set(pkg.get("source", {})))
+
+    def _is_project(pkg: dict) -> bool:
+        return bool({"editable", "virtual"} & set(pkg.get("source", {})))
+
+    roots = [pkg for pkgs in packages.values() for pkg in pkgs if _is_project(pkg)]
+    if not roots:  # no project information, take everything
+        roots = [{"dependencies": [{"name": name} for name in packages]}]
+
+    # walk the dependency graph, keeping the markers along each path
+    queue = deque((root, set(env.extras), None) for root in roots)
+    locked: dict[str, dict] = {}
+    markers: dict[str, set[str | None]] = {}
+    visited = set()
+    while queue:
+        pkg, extras, marker = queue.popleft()
+        deps = list(pkg.get("dependencies", []))
+        for e in extras:
+            deps += pkg.get("optional-dependencies", {}).get(e, [])
+            deps += pkg.get("dev-dependencies", {}).get(e, [])
+
+        for dep in deps:
+            candidates = packages.get(dep["name"], [])
+            if "version" in dep:
+                candidates = [
+                    c for c in candidates if c.get("version") == dep["version"]
+                ]
+            if not candidates:
+                continue
+            target = candidates[0]
+            dep_extras = frozenset(dep.get("extra", []))
+            dep_marker = _and_markers(marker, dep.get("marker"))
+
+            key = (target["name"], target.get("version"), dep_extras)
+            if (*key, None) in visited or (*key, dep_marker) in visited:
+                continue
+            visited.add((*key, dep_marker))
+            locked.setdefault(target["name"], target)
+            markers.setdefault(target["name"], set()).add(dep_marker)
+            queue.append((target, dep_extras, dep_marker))
+
+    reqs = []
+    for name, pkg in locked.items():
+        source = pkg.get("source", {})
+        if _is_local(pkg):
+            continue
+        elif "git" in source:
+            url, _, commit = source["git"].partition("#")
+            url = url.split("?")[0]
+            req = f"{name} @ git+{url}@{commit}" if commit else f"{name} @ git+{url}"
+        else:
+            req = f"{name}=={pkg['version']}"
+
+        # required unconditionally if any path has no markers
+        if None not in markers[name]:
+            paths = sorted(markers[name])
+            req += "; " + (
+                paths[0] if len(paths) == 1 else " or ".join(f"({m})" for m in paths)
+            )
+        reqs.append(req)
+
+    env.add_requirements(reqs)
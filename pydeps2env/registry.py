@@ -0,0 +1,150 @@
+"""Registry of source loaders and transports.
+
+Loaders parse the raw contents of a source file into an `Environment`, transports
+fetch the raw contents of non-local sources.
+Both can be extended by third party packages through entry points::
+
+    [project.entry-points."pydeps2env.loaders"]
+    "pixi.toml" = "my_package.pixi:load_pixi"
+
+    [project.entry-points."pydeps2env.transports"]
+    s3 = "my_package.s3:fetch"
+
+Loader entry points are named after the full filename (e.g. ``poetry.lock``) or the
+file suffix (e.g. ``.lock``), full filenames take precedence.
+A loader is called as ``loader(env, contents)`` with the `Environment` to update and
+the raw file contents as bytes.
+
+Transport entry points are named after the url scheme they handle (e.g. ``s3`` for
+``s3://bucket/pyproject.toml``).
+A transport is called as ``transport(url)`` and must return the raw file contents
+as bytes. Transports can optionally provide a ``prefetch(urls)`` method to read
+multiple sources at once before they are loaded.
+
+Entry points are only discovered once and only imported when a matching source is
+read.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections import defaultdict
+from importlib import import_module
+from pathlib import PurePath
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+LOADER_GROUP = "pydeps2env.loaders"
+TRANSPORT_GROUP = "pydeps2env.transports"
+
+# support running from the source directory without installing (see github action)
+_PACKAGE = __name__.rpartition(".")[0]
+_PREFIX = f"{_PACKAGE}." if _PACKAGE else ""
+
+_loaders: dict[str, Any] = {
+    ".toml": f"{_PREFIX}environment:Environment.load_pyproject",
+    ".cfg": f"{_PREFIX}environment:Environment.load_config",
+    ".yaml": f"{_PREFIX}environment:Environment.load_yaml",
+    ".yml": f"{_PREFIX}environment:Environment.load_yaml",
+    ".txt": f"{_PREFIX}environment:Environment.load_txt",
+    "Pipfile.lock": f"{_PREFIX}lockfiles:load_pipfile_lock",
+    "poetry.lock": f"{_PREFIX}lockfiles:load_poetry_lock",
+    "uv.lock": f"{_PREFIX}lockfiles:load_uv_lock",
+}
+
+_transports: dict[str, Any] = {
+    "http": f"{_PREFIX}environment:fetch_url",
+    "https": f"{_PREFIX}environment:fetch_url",
+    "git+file": f"{_PREFIX}git_sources:fetch_git",
+}
+
+_discovered = False
+
+
+def _entry_points(group: str) -> list:
+    from importlib.metadata import entry_points
+
+    if sys.version_info >= (3, 10):
+        return list(entry_points(group=group))
+    return list(entry_points().get(group, []))
+
+
+def _discover():
+    """Add all installed entry points to the registry (without importing them)."""
+    global _discovered
+    if _discovered:
+        return
+
+    for ep in _entry_points(LOADER_GROUP):
+        _loaders[ep.name] = ep
+    for ep in _entry_points(TRANSPORT_GROUP):
+        _transports[ep.name] = ep
+
+    _discovered = True
+
+
+def _resolve(registry: dict[str, Any], key: str) -> Callable:
+    """Import a registered object on first use and cache the result."""
+    obj = registry[key]
+    if isinstance(obj, str):
+        module, _, attrs = obj.partition(":")
+        obj = import_module(module)
+        for attr in attrs.split("."):
+            obj = getattr(obj, attr)
+    elif not callable(obj):  # entry point
+        obj = obj.load()
+
+    registry[key] = obj
+    return obj
+
+
+def register_loader(key: str, loader: Callable | str):
+    """Register a loader for a filename (e.g. ``poetry.lock``) or suffix (e.g. ``.lock``).
+
+    The loader can be given as a callable or as ``"module:attribute"`` import string.
+    """
+    _discover()
+    _loaders[key] = loader
+
+
+def register_transport(scheme: str, transport: Callable | str):
+    """Register a transport for the url ``scheme`` (e.g. ``s3``).
+
+    The transport can be given as a callable or as ``"module:attribute"`` import string.
+    """
+    _discover()
+    _transports[scheme] = transport
+
+
+def get_loader(filename: str | PurePath) -> Callable | None:
+    """Get the loader for a filename, matching the full name before the suffix."""
+    _discover()
+    path = PurePath(filename)
+    for key in (path.name, path.suffix):
+        if key in _loaders:
+            return _resolve(_loaders, key)
+    return None
+
+
+def prefetch_sources(sources: list[str]):
+    """Read sources in batches using the ``prefetch`` method of their transports."""
+    urls = defaultdict(list)
+    for source in sources:
+        if transport := get_transport(source):
+            urls[transport].append(source)
+
+    for transport, transport_urls in urls.items():
+        if hasattr(transport, "prefetch"):
+            transport.prefetch(transport_urls)
+
+
+def get_transport(source: str | PurePath) -> Callable | None:
+    """Get the transport for a source url or ``None`` for local files."""
+    if not isinstance(source, str):
+        return None
+
+    _discover()
+    scheme = urlsplit(source).scheme
+    if scheme in _transports:
+        return _resolve(_transports, scheme)
+    return None
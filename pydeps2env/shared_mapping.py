@@ -0,0 +1,130 @@
+"""Share the pypi<->conda name mappings with worker processes.
+
+The mappings are encoded once into a `multiprocessing.shared_memory` block. Worker
+processes attach to the block by name (passed to the process pool initializer) and
+look up names directly in the shared buffer instead of downloading and parsing the
+mapping again.
+
+Each table in the block is laid out as::
+
+    <n: uint32> <offsets: (2n + 1) * uint32> <data: utf-8 keys and values>
+
+with key ``i`` stored at ``data[offsets[2i]:offsets[2i+1]]`` and its value at
+``data[offsets[2i+1]:offsets[2i+2]]``. Entries are sorted by their encoded key, so
+lookups are a binary search over the shared buffer.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+_UINT = struct.Struct("<I")
+
+
+def _encode_table(mapping: Mapping[str, str]) -> bytes:
+    """Encode a mapping into a sorted table."""
+    items = sorted((k.encode(), v.encode()) for k, v in mapping.items())
+
+    offsets = [0]
+    for k, v in items:
+        offsets.append(offsets[-1] + len(k))
+        offsets.append(offsets[-1] + len(v))
+
+    return b"".join(
+        [
+            _UINT.pack(len(items)),
+            struct.pack(f"<{len(offsets)}I", *offsets),
+            *(k + v for k, v in items),
+        ]
+    )
+
+
+class SharedMapping(Mapping):
+    """Read-only str mapping backed by a table in a shared memory buffer."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, start: int):
+        self._shm = shm
+        (self._len,) = _UINT.unpack_from(shm.buf, start)
+        self._offsets = start + _UINT.size
+        self._data = self._offsets + (2 * self._len + 1) * _UINT.size
+
+    def _slice(self, index: int) -> bytes:
+        a, b = struct.unpack_from(
+            "<2I", self._shm.buf, self._offsets + index * _UINT.size
+        )
+        return bytes(self._shm.buf[self._data + a : self._data + b])
+
+    def _find(self, key: str) -> int:
+        target = key.encode()
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._slice(2 * mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._len and self._slice(2 * lo) == target:
+            return lo
+        return -1
+
+    def __getitem__(self, key: str) -> str:
+        if isinstance(key, str) and (i := self._find(key)) >= 0:
+            return self._slice(2 * i + 1).decode()
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._len):
+            yield self._slice(2 * i).decode()
+
+    def __len__(self) -> int:
+        return self._len
+
+
+@contextmanager
+def share_mappings(*mappings: Mapping[str, str]) -> Iterator[str]:
+    """Copy mappings into a shared memory block and yield the name of the block.
+
+    The block is released when the context exits.
+    """
+    tables = [_encode_table(m) for m in mappings]
+    header = struct.pack(f"<I{len(tables)}I", len(tables), *map(len, tables))
+    size = len(header) + sum(map(len, tables))
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shm.buf[: len(header)] = header
+        pos = len(header)
+        for table in tables:
+            shm.buf[pos : pos + len(table)] = table
+            pos += len(table)
+
+        yield shm.name
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def attach_mappings(name: str) -> tuple[SharedMapping, ...]:
+    """Attach to the mappings shared by `share_mappings` under `name`."""
+    if sys.version_info >= (3, 13):
+        # the creating process owns (and unlinks) the block
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+
+    (n,) = _UINT.unpack_from(shm.buf, 0)
+    sizes = struct.unpack_from(f"<{n}I", shm.buf, _UINT.size)
+
+    mappings = []
+    pos = _UINT.size * (n + 1)
+    for size in sizes:
+        mappings.append(SharedMapping(shm, pos))
+        pos += size
+    return tuple(mappings)
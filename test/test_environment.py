@@ -1,4 +1,8 @@
+import multiprocessing
+
 import pytest
+from packaging.requirements import Requirement
+from packaging.specifiers import SpecifierSet
 from pydeps2env import Environment, create_environment, create_from_definition
 
 _inputs = [
@@ -7,6 +11,9 @@ _inputs = [
     "./test/requirements.txt",
     "./test/environment.yaml",
     "./test/local.yaml",
+    "./test/Pipfile.lock",
+    "./test/poetry.lock[test]",
+    "./test/uv.lock[test]",
     "https://raw.githubusercontent.com/BAMWelDX/weldx/master/pyproject.toml[test]",
     "https://github.com/BAMWelDX/weldx/blob/master/pyproject.toml[test]",
     "https://raw.githubusercontent.com/BAMWelDX/weldx/v0.3.2/setup.cfg[test]",
@@ -43,6 +50,355 @@ class TestEnvironment:
             # include extras specifier in pip format
             assert "setuptools-scm[toml]" in pip_txt
 
+    # test_lockfiles -------------------------------------------------------------------
+
+    @pytest.mark.parametrize(
+        "filename", ["./test/Pipfile.lock", "./test/poetry.lock", "./test/uv.lock"]
+    )
+    @pytest.mark.parametrize("extras", [[], ["test"], ["dev"]])
+    def test_lockfiles(self, filename: str, extras: list[str]):
+        """Test loading pinned requirements from lockfiles."""
+        env = Environment(filename, extras=extras)
+
+        assert str(env.requirements["numpy"].specifier) == "==1.26.4"
+        assert env.requirements["pydeps2env"].url.startswith(
+            "git+https://github.com/CagtayFabry/pydeps2env.git@0123456"
+        )
+        assert "pydeps2env" in env.pip_packages
+        assert "mypkg" not in env.requirements  # local project
+        assert "localwheel" not in env.requirements  # local wheel
+
+        # optional dependencies and development groups
+        if filename.endswith("uv.lock"):
+            assert ("pytest" in env.requirements) == ("test" in extras)
+            assert ("ruff" in env.requirements) == ("dev" in extras)
+            assert ("iniconfig" in env.requirements) == ("test" in extras)
+            if "test" in extras:
+                assert (
+                    'colorama==0.4.6; sys_platform == "win32"'
+                    in env._get_pip_dependencies()
+                )
+        else:
+            assert ("pytest" in env.requirements) == ("dev" in extras)
+
+        if filename.endswith("poetry.lock"):
+            assert env.requirements["python"].specifier == SpecifierSet(">=3.9,<4")
+            # dependencies of optional packages are optional as well
+            for name in ["requests", "idna", "urllib3"]:
+                assert (name in env.requirements) == ("test" in extras)
+            assert "pysocks" not in env.requirements
+            if "test" in extras:
+                assert (
+                    'idna==3.7; python_version >= "3.9"' in env._get_pip_dependencies()
+                )
+            if "dev" in extras:
+                assert (
+                    'colorama==0.4.6; sys_platform == "win32"'
+                    in env._get_pip_dependencies()
+                )
+
+        if filename.endswith("Pipfile.lock"):
+            assert env.requirements["requests"].extras == {"socks"}
+
+    @pytest.mark.parametrize(
+        "spec, expected",
+        [
+            ("^3.9", ">=3.9,<4"),
+            ("^0.2.3", ">=0.2.3,<0.3"),
+            ("~3.9", ">=3.9,<3.10"),
+            ("~3", ">=3,<4"),
+            (">=3.9 <3.13", ">=3.9,<3.13"),
+            ("3.9.*", "==3.9.*"),
+            (">= 3.9, < 4", ">=3.9,<4"),
+            ("^3.9 || ^4.1", None),
+        ],
+    )
+    def test_poetry_constraint(self, spec: str, expected: str):
+        """Test converting poetry version constraints."""
+        from pydeps2env.lockfiles import _poetry_constraint
+
+        assert _poetry_constraint(spec) == expected
+
+    @pytest.mark.parametrize(
+        "markers, expected",
+        [
+            ('extra == "test" and sys_platform == "win32"', 'sys_platform == "win32"'),
+            ('extra == "a" or extra == "b"', None),
+            (
+                '(extra == "a" or extra == "b") and python_version < "3.10"',
+                'python_version < "3.10"',
+            ),
+            (
+                '(os_name == "nt" or extra_index == "x") and extra == "test"',
+                'os_name == "nt" or extra_index == "x"',
+            ),
+        ],
+    )
+    def test_poetry_markers(self, markers: str, expected: str):
+        """Test removing extra clauses from poetry markers."""
+        from pydeps2env.lockfiles import _strip_extra_markers
+
+        assert _strip_extra_markers(markers) == expected
+
+    def test_python_requirement_warning(self):
+        """Test warning about python version specifications that are not valid."""
+        from pydeps2env.lockfiles import _python_requirement
+
+        with pytest.warns(UserWarning, match="Cannot convert python version"):
+            assert _python_requirement(">=,==3.9") == []
+
+    # test_export ----------------------------------------------------------------------
+
+    def test_export(self, tmp_path, capsys):
+        """Test streaming the export to files, streams and stdout."""
+        import io
+        from unittest.mock import patch
+
+        import yaml
+
+        env = Environment("./test/local.yaml", pip_packages=["python-dateutil"])
+        env.add_requirements(["python-dateutil", "pyyaml>=6"])
+        conda_env = env.export(None, name="test")
+        expected = yaml.dump(conda_env, default_flow_style=False, sort_keys=False)
+
+        stream = io.StringIO()
+        env.export(stream, name="test")
+        assert stream.getvalue() == expected
+
+        env.export("-", name="test")
+        assert capsys.readouterr().out == expected
+
+        fn = tmp_path / "environment.yaml"
+        fn.write_text("old")
+        env.export(fn, name="test")
+        assert fn.read_text() == expected
+        assert [p.name for p in tmp_path.iterdir()] == ["environment.yaml"]
+
+        # non-string scalars
+        stream = io.StringIO()
+        env.export(stream, name=2024)
+        assert stream.getvalue() == yaml.dump(
+            env.export(None, name=2024), default_flow_style=False, sort_keys=False
+        )
+        assert stream.getvalue().startswith("name: 2024\n")
+
+        fn = tmp_path / "requirements.txt"
+        env.export(fn)
+        assert fn.read_text() == "\n".join(env._get_pip_dependencies())
+
+        # keep the existing file on errors
+        def broken_emit(events, stream):
+            stream.write("partial")
+            raise RuntimeError
+
+        fn = tmp_path / "environment.yaml"
+        with patch("yaml.emit", broken_emit), pytest.raises(RuntimeError):
+            env.export(fn)
+        assert fn.read_text() == expected
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_export_symlink(self, tmp_path):
+        """Test writing through a symlinked output file."""
+        target_dir = tmp_path / "target"
+        target_dir.mkdir()
+        target = target_dir / "environment.yaml"
+        target.write_text("old")
+        link = tmp_path / "environment.yaml"
+        try:
+            link.symlink_to(target)
+        except OSError:
+            pytest.skip("symlinks not supported")
+
+        env = Environment("./test/requirements.txt")
+        env.export(link)
+
+        assert link.is_symlink()
+        assert "urllib3" in target.read_text()
+        assert sorted(p.name for p in target_dir.iterdir()) == ["environment.yaml"]
+
+    def test_export_mode(self, tmp_path):
+        """Test that new output files get the permissions of regular new files."""
+        import os
+
+        reference = tmp_path / "reference.yaml"
+        reference.write_text("")
+        outfile = tmp_path / "environment.yaml"
+        Environment("./test/requirements.txt").export(outfile)
+
+        if os.name == "posix":
+            assert outfile.stat().st_mode == reference.stat().st_mode
+
+    # test_render ----------------------------------------------------------------------
+
+    def test_render_cache(self):
+        """Test reusing and invalidating the rendered requirements."""
+        from pydeps2env.environment import add_requirement
+
+        env = Environment("./test/environment.yaml")
+
+        conda, _ = env._get_conda_dependencies(remove=["pyyaml"])
+        rendering = env._render()
+        assert env._render() is rendering
+        assert env._get_conda_dependencies(remove=["pyyaml"])[0] == conda
+        assert env._get_pip_dependencies(include_build_system=False)
+        assert len(env._rendered) == 2
+
+        env.add_requirements(["k3d"])
+        assert env._render() is not rendering
+        assert "k3d" in env._get_conda_dependencies()[0]
+
+        env.pip_packages |= {"k3d"}
+        conda, pip = env._get_conda_dependencies()
+        assert "k3d" not in conda
+        assert "k3d" in pip
+
+        # modifications outside of the Environment methods
+        add_requirement("k3d>=2", env.requirements)
+        assert "k3d>=2" in env._get_pip_dependencies()
+        env.requirements["psutil"] = Requirement("psutil")
+        assert "psutil" in env._get_pip_dependencies()
+        del env.requirements["psutil"]
+        assert "psutil" not in env._get_pip_dependencies()
+        add_requirement("hatchling", env.build_system)
+        assert "hatchling" in env._get_pip_dependencies(include_build_system=True)
+
+        env.combine(Environment("./test/requirements.txt"))
+        assert "urllib3" in env._get_pip_dependencies()
+
+        # replaced name mappings
+        from pydeps2env.environment import get_mappings, set_mappings
+
+        mappings = get_mappings()
+        try:
+            set_mappings({**mappings[0], "urllib3": "urllib3-renamed"}, mappings[1])
+            assert "urllib3-renamed" in env._get_conda_dependencies()[0]
+        finally:
+            set_mappings(*mappings)
+        assert "urllib3" in env._get_conda_dependencies()[0]
+
+        # plain dicts are not cached
+        env.requirements = {"numpy": Requirement("numpy")}
+        assert env._get_pip_dependencies(include_build_system=False) == ["numpy"]
+        env.requirements["scipy"] = Requirement("scipy")
+        assert "scipy" in env._get_pip_dependencies(include_build_system=False)
+
+
+def test_register_loader(tmp_path):
+    """Test registering a custom loader for a file suffix."""
+    from pydeps2env import register_loader, registry
+
+    def load_custom(env, contents: bytes):
+        env.add_requirements(contents.decode().split(","))
+
+    fn = tmp_path / "custom.deps"
+    fn.write_text("python>=3.10,numpy")
+
+    with pytest.raises(ValueError):
+        Environment(fn)
+
+    register_loader(".deps", load_custom)
+    try:
+        env = Environment(fn)
+        assert "python" in env.requirements
+        assert "numpy" in env.requirements
+    finally:
+        registry._loaders.pop(".deps")
+
+
+def test_register_transport():
+    """Test reading sources through a custom transport."""
+    from pydeps2env import register_transport, registry
+
+    def fetch(url: str) -> bytes:
+        return b"python>=3.10\nnumpy\n"
+
+    register_transport("mock", fetch)
+    try:
+        env = Environment("mock://server/requirements.txt")
+        assert "numpy" in env.requirements
+
+        # filename in the url query
+        env = Environment("mock://server/api/raw?file=requirements.txt")
+        assert "numpy" in env.requirements
+    finally:
+        registry._transports.pop("mock")
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """Create a git repository with different requirements on two refs."""
+    import shutil
+    import subprocess
+
+    def git(*args):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+            cwd=tmp_path,
+            check=True,
+            capture_output=True,
+        )
+
+    shutil.copy("./test/pyproject.toml", tmp_path / "pyproject.toml")
+    (tmp_path / "sub").mkdir()
+    shutil.copy("./test/requirements.txt", tmp_path / "sub" / "requirements.txt")
+    git("init")
+    git("add", ".")
+    git("commit", "-m", "v1")
+    git("tag", "v1")
+
+    (tmp_path / "sub" / "requirements.txt").write_text("python>=3.10\nrequests\n")
+    git("commit", "-am", "v2")
+
+    # changes in the worktree must not be visible
+    (tmp_path / "sub" / "requirements.txt").write_text("")
+
+    return tmp_path
+
+
+def test_git_sources(git_repo):
+    """Test reading sources from a local git repository at different refs."""
+    from pydeps2env.git_sources import parse_git_url
+
+    repo = git_repo.as_posix()
+    assert parse_git_url(f"git+file://{repo}@v1:sub/requirements.txt") == (
+        repo,
+        "v1",
+        "sub/requirements.txt",
+    )
+
+    env = create_environment(
+        [
+            f"git+file://{repo}@v1:pyproject.toml[test]",
+            f"git+file://{repo}@v1:sub/requirements.txt",
+        ]
+    )
+    assert "pytest" in env.requirements
+    assert "urllib3" in env.requirements
+
+    env = Environment(f"git+file://{repo}@HEAD:sub/requirements.txt")
+    assert "requests" in env.requirements
+    assert "urllib3" not in env.requirements
+
+    # refs and paths containing `@`
+    assert parse_git_url(f"git+file://{repo}@HEAD@{{1}}:a@b.txt") == (
+        repo,
+        "HEAD@{1}",
+        "a@b.txt",
+    )
+    env = Environment(f"git+file://{repo}@HEAD@{{1}}:sub/requirements.txt")
+    assert "urllib3" in env.requirements
+
+    with pytest.raises(FileNotFoundError):
+        Environment(f"git+file://{repo}@v1:missing.txt")
+    with pytest.raises(FileNotFoundError, match="Could not find git repository"):
+        Environment(f"git+file://{repo}/missing@v1:pyproject.toml")
+    with pytest.raises(ValueError, match="not a git repository"):
+        Environment(f"git+file://{git_repo.parent.as_posix()}@v1:pyproject.toml")
+    with pytest.raises(ValueError, match="is not a file"):
+        Environment(f"git+file://{repo}@v1:sub")
+    with pytest.raises(ValueError):
+        Environment(f"git+file://{repo}:pyproject.toml")
+
 
 def test_multiple_sources():
     env = create_environment(
@@ -67,19 +423,109 @@ def test_definition():
     create_from_definition("./test/definition.yaml")
 
 
+@pytest.mark.parametrize(
+    "start_method",
+    [
+        m
+        for m in ["fork", "spawn", "forkserver"]
+        if m in multiprocessing.get_all_start_methods()
+    ],
+)
+def test_definition_jobs(tmp_path, capsys, start_method):
+    """Test creating multiple definitions in parallel with ordered stdout output."""
+    import yaml
+
+    from pydeps2env import environment
+
+    configs = [
+        {"output": "-", "name": "first", "sources": ["./test/local.yaml"]},
+        {
+            "output": str(tmp_path / "second.yaml"),
+            "sources": ["./test/requirements.txt", "./test/environment.yaml"],
+            "pip": ["pyyaml"],
+        },
+        {
+            "output": "-",
+            "name": "third",
+            "sources": ["./test/requirements.txt"],
+            "additional_requirements": ["setuptools-scm", "k3d"],
+        },
+    ]
+    fn = tmp_path / "definition.yaml"
+    fn.write_text(yaml.dump(configs))
+
+    # workers can only know about this mapping through the shared memory
+    pypi_to_conda, conda_to_pypi = environment.get_mappings()
+    environment.set_mappings({**pypi_to_conda, "k3d": "k3d-shared"}, conda_to_pypi)
+    try:
+        create_from_definition(fn)
+        expected = capsys.readouterr().out
+        second = (tmp_path / "second.yaml").read_text()
+        assert expected.index("name: first") < expected.index("name: third")
+        assert "- k3d-shared" in expected
+        assert "- setuptools_scm" in expected
+
+        context = multiprocessing.get_context(start_method)
+        for _ in range(2):  # the shared memory is released after each call
+            (tmp_path / "second.yaml").unlink()
+            create_from_definition([fn], jobs=2, mp_context=context)
+            assert capsys.readouterr().out == expected
+            assert (tmp_path / "second.yaml").read_text() == second
+    finally:
+        environment.set_mappings(pypi_to_conda, conda_to_pypi)
+
+
+def test_shared_mapping():
+    """Test looking up the name mappings from shared memory."""
+    from pydeps2env.environment import conda_to_pypi_mapping, pypi_to_conda_mapping
+    from pydeps2env.shared_mapping import attach_mappings, share_mappings
+
+    with share_mappings(pypi_to_conda_mapping, conda_to_pypi_mapping) as name:
+        pypi_to_conda, conda_to_pypi = attach_mappings(name)
+
+        assert len(pypi_to_conda) == len(pypi_to_conda_mapping)
+        assert len(conda_to_pypi) == len(conda_to_pypi_mapping)
+        assert pypi_to_conda["setuptools-scm"] == "setuptools_scm"
+        assert conda_to_pypi["setuptools_scm"] == "setuptools-scm"
+        assert "not-a-package" not in pypi_to_conda
+        assert pypi_to_conda.get("not-a-package") is None
+        assert dict(pypi_to_conda) == pypi_to_conda_mapping
+
+
+@pytest.mark.parametrize(
+    "args", [["--definition"], ["--jobs", "2"], ["pyproject.toml", "-j", "2"]]
+)
+def test_cli_definition_args(monkeypatch, args):
+    """Test rejecting incomplete definition options on the command line."""
+    from pydeps2env.generate_environment import main
+
+    monkeypatch.setattr("sys.argv", ["pydeps2env", *args])
+    with pytest.raises(SystemExit):
+        main()
+
+
 def test_definition_offline():
     """Ensure we can map pypi to conda pkgs, even if we cannot download a current mapping."""
     from unittest.mock import patch
 
-    def dummy():
+    from pydeps2env import environment
+
+    def dummy(*args, **kwargs):
         from urllib.error import URLError
 
-        raise URLError
+        raise URLError("offline")
 
-    with patch("urllib.request.urlretrieve", dummy):
-        create_environment(
-            _inputs,
-            extras=["test"],
-            pip=["setuptools-scm", "weldx-widgets"],
-            additional_requirements=["k3d"],
-        )
+    mappings = environment.get_mappings()
+    try:
+        with patch("urllib.request.urlretrieve", dummy):
+            environment._mappings = None  # force loading the mapping again
+            mapping = environment.pypi_to_conda_mapping
+            assert mapping["setuptools-scm"] == "setuptools_scm"
+            create_environment(
+                _inputs,
+                extras=["test"],
+                pip=["setuptools-scm", "weldx-widgets"],
+                additional_requirements=["k3d"],
+            )
+    finally:
+        environment.set_mappings(*mappings)